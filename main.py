@@ -1,31 +1,89 @@
-import json
+import atexit
+import functools
+import hashlib
 import os
 import queue
+import random
 import re
 import shutil
+import signal
+import subprocess
+import sys
 import threading
 import time
 import traceback
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
-from dropbox import Dropbox
-from dropbox.files import CommitInfo, UploadSessionCursor, WriteMode
-from dropbox.exceptions import ApiError
-from google.auth.transport.requests import Request as GoogleAuthRequest
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+
+# dropbox / googleapiclient / google-auth are imported where they are used: each
+# run needs only one publish backend, and these SDKs dominate cold-start time.
+if TYPE_CHECKING:
+    from dropbox import Dropbox
+    from google_auth_httplib2 import AuthorizedHttp
 
 
 YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+YT_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+CLIP_DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+# files_upload needs the whole body as bytes (and the SDK copies it again into the
+# request), so only small files take the single-request path; everything else is
+# streamed through an upload session chunk by chunk.
+DROPBOX_SINGLE_UPLOAD_LIMIT = 8 * 1024 * 1024  # 8 MB
+DROPBOX_CHUNK_SIZE = 16 * 1024 * 1024  # 16 MB, must be a multiple of the hash block
+DROPBOX_HASH_BLOCK_SIZE = 4 * 1024 * 1024  # fixed by Dropbox content_hash spec
+PROCESSED_SAVE_INTERVAL_SEC = 30
+YT_UPLOAD_WORKERS = 3
+YT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB, must be a multiple of 256 KB
+EVENT_QUEUE_MAXSIZE = 128
+EVENT_DEDUP_WINDOW_SEC = 300
+EVENT_DEDUP_MAX_KEYS = 256
+EVENT_IDLE_LOG_SEC = 60
+ENV_LOADED_FLAG = "TWITCH_CUTTER_ENV_LOADED"
+_SAFE_NAME_RE = re.compile(r"[^a-zA-Z0-9._-]+")
+
+
+def _build_http_session(
+    status_forcelist: Tuple[int, ...] = (429, 500, 502, 503, 504), pool_size: int = 32
+) -> requests.Session:
+    session = requests.Session()
+    # Only idempotent methods are retried (urllib3 default); POSTs are sent once.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=list(status_forcelist),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Set on shutdown so long waits (e.g. Opus polling) can stop without sleeping out.
+_SHUTDOWN = threading.Event()
+# Put on the event queue to wake a blocked consumer for shutdown; compared by identity.
+_STOP_EVENT: Dict[str, Any] = {"action": "shutdown"}
+
+# Shared keep-alive session for Opus, clip downloads and Dropbox; safe to use
+# for concurrent GETs from worker threads.
+_HTTP = _build_http_session()
+# Opus polling handles 429/503 + Retry-After itself (interruptible via _SHUTDOWN and
+# bounded by the wait timeout), so its transport must not retry or sleep on them.
+_HTTP_POLL = _build_http_session(status_forcelist=(500, 502, 504), pool_size=4)
 
 
 def _to_bool(raw: str, default: bool = False) -> bool:
@@ -34,8 +92,22 @@ def _to_bool(raw: str, default: bool = False) -> bool:
     return str(raw).strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    raw = response.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return None
+
+
 def _safe_name(name: str) -> str:
-    return re.sub(r"[^a-zA-Z0-9._-]+", "_", name).strip("_")
+    return _SAFE_NAME_RE.sub("_", name).strip("_")
+
+
+def _split_csv(raw: str) -> Tuple[str, ...]:
+    return tuple(x for x in (part.strip() for part in raw.split(",")) if x)
 
 
 def log(msg: str, level: str = "INFO") -> None:
@@ -63,6 +135,7 @@ class Settings:
     poll_interval_sec: int
     stable_for_sec: int
     min_vod_size_mb: int
+    vod_watch_events: bool
     processed_state_file: Path
     source_path_rewrite_from: str
     source_path_rewrite_to: str
@@ -71,6 +144,7 @@ class Settings:
     publish_mode: str  # local_http | dropbox
     public_output_dir: Path
     public_base_url: str
+    publish_copy_mode: str  # link | reflink | copy (local_http only)
     # Dropbox (when publish_mode=dropbox)
     dropbox_access_token: str
     dropbox_folder: str
@@ -103,81 +177,97 @@ class Settings:
     explicit_vod_file: Optional[Path]
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def from_env() -> "Settings":
-        load_dotenv()
-
-        watch_dir = Path(os.getenv("WATCH_DIR", "./data/storage/vods")).resolve()
-        vod_ext_raw = os.getenv("VOD_EXTENSIONS", ".ts,.mp4,.mkv")
+        # Child processes and repeated calls inherit the already-loaded environment.
+        if not os.getenv(ENV_LOADED_FLAG):
+            load_dotenv()
+            os.environ[ENV_LOADED_FLAG] = "1"
+        env = dict(os.environ)
+
+        watch_dir = Path(env.get("WATCH_DIR", "./data/storage/vods")).resolve()
+        vod_ext_raw = env.get("VOD_EXTENSIONS", ".ts,.mp4,.mkv")
         vod_exts = tuple(
-            e if e.startswith(".") else f".{e}"
-            for e in [x.strip().lower() for x in vod_ext_raw.split(",") if x.strip()]
+            e if e.startswith(".") else f".{e}" for e in _split_csv(vod_ext_raw.lower())
         )
 
-        explicit_vod = os.getenv("VOD_FILE")
-        yt_tags_raw = os.getenv("YT_DEFAULT_TAGS", "shorts,twitch,clips")
-        yt_tags = [t.strip() for t in yt_tags_raw.split(",") if t.strip()]
+        explicit_vod = env.get("VOD_FILE")
+        yt_tags_raw = env.get("YT_DEFAULT_TAGS", "shorts,twitch,clips")
+        yt_tags = list(_split_csv(yt_tags_raw))
 
-        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook/livestreamdvr")
+        webhook_path = env.get("WEBHOOK_PATH", "/webhook/livestreamdvr")
         if not webhook_path.startswith("/"):
             webhook_path = "/" + webhook_path
 
         return Settings(
-            trigger_mode=os.getenv("TRIGGER_MODE", "webhook").strip().lower(),
-            webhook_host=os.getenv("WEBHOOK_HOST", "127.0.0.1"),
-            webhook_port=int(os.getenv("WEBHOOK_PORT", "8090")),
+            trigger_mode=env.get("TRIGGER_MODE", "webhook").strip().lower(),
+            webhook_host=env.get("WEBHOOK_HOST", "127.0.0.1"),
+            webhook_port=int(env.get("WEBHOOK_PORT", "8090")),
             webhook_path=webhook_path,
-            webhook_token=os.getenv("WEBHOOK_TOKEN", "").strip(),
+            webhook_token=env.get("WEBHOOK_TOKEN", "").strip(),
             watch_dir=watch_dir,
             vod_extensions=vod_exts,
-            poll_interval_sec=int(os.getenv("POLL_INTERVAL_SEC", "20")),
-            stable_for_sec=int(os.getenv("STABLE_FOR_SEC", "120")),
-            min_vod_size_mb=int(os.getenv("MIN_VOD_SIZE_MB", "200")),
+            poll_interval_sec=int(env.get("POLL_INTERVAL_SEC", "20")),
+            stable_for_sec=int(env.get("STABLE_FOR_SEC", "120")),
+            min_vod_size_mb=int(env.get("MIN_VOD_SIZE_MB", "200")),
+            vod_watch_events=_to_bool(env.get("VOD_WATCH_EVENTS", "true"), default=True),
             processed_state_file=Path(
-                os.getenv("PROCESSED_STATE_FILE", "./processed_vods.json")
+                env.get("PROCESSED_STATE_FILE", "./processed_vods.json")
             ).resolve(),
-            source_path_rewrite_from=os.getenv("SOURCE_PATH_REWRITE_FROM", "").strip(),
-            source_path_rewrite_to=os.getenv("SOURCE_PATH_REWRITE_TO", "").strip(),
-            publish_mode=os.getenv("PUBLISH_MODE", "local_http").strip().lower(),
+            source_path_rewrite_from=env.get("SOURCE_PATH_REWRITE_FROM", "").strip(),
+            source_path_rewrite_to=env.get("SOURCE_PATH_REWRITE_TO", "").strip(),
+            publish_mode=env.get("PUBLISH_MODE", "local_http").strip().lower(),
             public_output_dir=Path(
-                os.getenv("PUBLIC_OUTPUT_DIR", "./public_vods")
+                env.get("PUBLIC_OUTPUT_DIR", "./public_vods")
             ).resolve(),
-            public_base_url=os.getenv("PUBLIC_BASE_URL", "").rstrip("/"),
-            dropbox_access_token=os.getenv("DROPBOX_ACCESS_TOKEN", "").strip(),
-            dropbox_folder=os.getenv("DROPBOX_FOLDER", "/twitch_vods").rstrip("/"),
-            opus_api_base=os.getenv("OPUS_API_BASE", "https://api.opus.pro"),
-            opus_bearer_token=os.getenv("OPUS_BEARER_TOKEN", "").strip(),
-            opus_org_id=os.getenv("OPUS_ORG_ID"),
-            opus_user_id=os.getenv("OPUS_USER_ID"),
-            opus_lang=os.getenv("OPUS_LANG", "en"),
-            opus_clip_min_sec=int(os.getenv("OPUS_CLIP_MIN_SEC", "15")),
-            opus_clip_max_sec=int(os.getenv("OPUS_CLIP_MAX_SEC", "30")),
-            opus_layout_aspect_ratio=os.getenv("OPUS_LAYOUT_ASPECT_RATIO", "portrait"),
-            opus_custom_prompt=os.getenv(
+            public_base_url=env.get("PUBLIC_BASE_URL", "").rstrip("/"),
+            publish_copy_mode=env.get("PUBLISH_COPY_MODE", "link").strip().lower(),
+            dropbox_access_token=env.get("DROPBOX_ACCESS_TOKEN", "").strip(),
+            dropbox_folder=env.get("DROPBOX_FOLDER", "/twitch_vods").rstrip("/"),
+            opus_api_base=env.get("OPUS_API_BASE", "https://api.opus.pro"),
+            opus_bearer_token=env.get("OPUS_BEARER_TOKEN", "").strip(),
+            opus_org_id=env.get("OPUS_ORG_ID"),
+            opus_user_id=env.get("OPUS_USER_ID"),
+            opus_lang=env.get("OPUS_LANG", "en"),
+            opus_clip_min_sec=int(env.get("OPUS_CLIP_MIN_SEC", "15")),
+            opus_clip_max_sec=int(env.get("OPUS_CLIP_MAX_SEC", "30")),
+            opus_layout_aspect_ratio=env.get("OPUS_LAYOUT_ASPECT_RATIO", "portrait"),
+            opus_custom_prompt=env.get(
                 "OPUS_CUSTOM_PROMPT", ""
             ),
-            opus_brand_template_id=os.getenv("OPUS_BRAND_TEMPLATE_ID"),
-            opus_source_lang=os.getenv("OPUS_SOURCE_LANG", "ru"),
-            opus_wait_timeout_sec=int(os.getenv("OPUS_WAIT_TIMEOUT_SEC", "300")),
-            opus_poll_interval_sec=int(os.getenv("OPUS_POLL_INTERVAL_SEC", "15")),
+            opus_brand_template_id=env.get("OPUS_BRAND_TEMPLATE_ID"),
+            opus_source_lang=env.get("OPUS_SOURCE_LANG", "ru"),
+            opus_wait_timeout_sec=int(env.get("OPUS_WAIT_TIMEOUT_SEC", "300")),
+            opus_poll_interval_sec=int(env.get("OPUS_POLL_INTERVAL_SEC", "15")),
             yt_client_secret_file=Path(
-                os.getenv("YT_CLIENT_SECRET_FILE", "./youtube_client_secret.json")
+                env.get("YT_CLIENT_SECRET_FILE", "./youtube_client_secret.json")
             ).resolve(),
-            yt_token_file=Path(os.getenv("YT_TOKEN_FILE", "./youtube_token.json")).resolve(),
-            yt_privacy_status=os.getenv("YT_PRIVACY_STATUS", "public"),
-            yt_category_id=os.getenv("YT_CATEGORY_ID", "22"),
-            yt_title_prefix=os.getenv("YT_TITLE_PREFIX", "Short clip"),
+            yt_token_file=Path(env.get("YT_TOKEN_FILE", "./youtube_token.json")).resolve(),
+            yt_privacy_status=env.get("YT_PRIVACY_STATUS", "public"),
+            yt_category_id=env.get("YT_CATEGORY_ID", "22"),
+            yt_title_prefix=env.get("YT_TITLE_PREFIX", "Short clip"),
             yt_default_tags=yt_tags,
-            run_once=_to_bool(os.getenv("RUN_ONCE", "true"), default=True),
+            run_once=_to_bool(env.get("RUN_ONCE", "true"), default=True),
             explicit_vod_file=Path(explicit_vod).resolve() if explicit_vod else None,
         )
 
 
 class OpusClient:
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        session: Optional[requests.Session] = None,
+        poll_session: Optional[requests.Session] = None,
+    ):
         self.s = settings
-        self.session = requests.Session()
-
-    def _headers(self) -> Dict[str, str]:
+        self.session = session or _HTTP
+        self.poll_session = poll_session or _HTTP_POLL
+        # Built once and passed per request rather than set on the session: the
+        # session is shared with clip downloads and Dropbox, which must not see
+        # the Opus bearer token.
+        self._base_headers = self._build_headers()
+
+    def _build_headers(self) -> Dict[str, str]:
         headers = {
             "Authorization": f"Bearer {self.s.opus_bearer_token}",
             "Content-Type": "application/json",
@@ -190,6 +280,9 @@ class OpusClient:
             headers["x-opus-user-id"] = self.s.opus_user_id
         return headers
 
+    def _headers(self) -> Dict[str, str]:
+        return self._base_headers
+
     def create_clip_project(self, video_url: str) -> str:
         log(f"Creating Opus clip project for URL: {video_url}")
         payload: Dict[str, Any] = {
@@ -235,39 +328,85 @@ class OpusClient:
         url = f"{self.s.opus_api_base.rstrip('/')}/api/exportable-clips"
         started = time.time()
         poll_no = 0
+        max_delay = max(1, self.s.opus_poll_interval_sec)
+        delay = min(max_delay, max(2, self.s.opus_poll_interval_sec // 4))
+        etag: Optional[str] = None
         while True:
             poll_no += 1
-            r = self.session.get(
+            headers = self._headers()
+            if etag:
+                headers = {**headers, "If-None-Match": etag}
+            r = self.poll_session.get(
                 url,
-                headers=self._headers(),
+                headers=headers,
                 params={"projectId": project_id},
                 timeout=45,
             )
-            r.raise_for_status()
-            body = r.json()
-            clips = body.get("data", [])
-            if isinstance(clips, list) and len(clips) > 0:
-                log(f"Opus returned {len(clips)} clip(s) on poll #{poll_no}")
-                return clips
+            throttled = r.status_code in (429, 503)
+            if not throttled and r.status_code != 304:
+                # 304 means the (empty) clip list has not changed since the last poll.
+                r.raise_for_status()
+                etag = r.headers.get("ETag") or None
+                body = r.json()
+                clips = body.get("data", [])
+                if isinstance(clips, list) and len(clips) > 0:
+                    log(f"Opus returned {len(clips)} clip(s) on poll #{poll_no}")
+                    return clips
 
             elapsed = time.time() - started
             if elapsed > self.s.opus_wait_timeout_sec:
                 raise TimeoutError(
                     f"Opus clips are not ready after {self.s.opus_wait_timeout_sec}s"
                 )
-            log(
-                f"Opus clips are not ready yet (poll #{poll_no}, elapsed={int(elapsed)}s). "
-                f"Sleeping {self.s.opus_poll_interval_sec}s"
-            )
-            time.sleep(self.s.opus_poll_interval_sec)
+            retry_after = _retry_after_seconds(r) if throttled else None
+            if retry_after is not None:
+                sleep_s = retry_after
+            else:
+                # Jitter around the current delay so the average rate never exceeds it.
+                sleep_s = random.uniform(delay * 0.75, delay * 1.25)
+                delay = min(max_delay, delay * 2)
+            # One last poll right at the deadline rather than sleeping past it.
+            sleep_s = min(sleep_s, max(0.0, self.s.opus_wait_timeout_sec - elapsed))
+            if throttled:
+                log(
+                    f"Opus API throttled (HTTP {r.status_code}) on poll #{poll_no}. "
+                    f"Sleeping {sleep_s:.1f}s",
+                    level="WARNING",
+                )
+            else:
+                log(
+                    f"Opus clips are not ready yet (poll #{poll_no}, elapsed={int(elapsed)}s). "
+                    f"Sleeping {sleep_s:.1f}s"
+                )
+            if _SHUTDOWN.wait(sleep_s):
+                raise InterruptedError("Shutdown requested while waiting for Opus clips")
 
 
 class YouTubeUploader:
     def __init__(self, settings: Settings):
         self.s = settings
+        self._local = threading.local()
         self.service = self._build_service()
 
+    def _thread_http(self) -> "AuthorizedHttp":
+        # httplib2.Http is not thread-safe, so each upload thread gets its own transport.
+        # build_http() keeps 308 (Resume Incomplete) out of redirect handling, which
+        # chunked resumable uploads rely on, and sets googleapiclient's socket timeout.
+        http = getattr(self._local, "http", None)
+        if http is None:
+            from google_auth_httplib2 import AuthorizedHttp
+            from googleapiclient.http import build_http
+
+            http = AuthorizedHttp(self.creds, http=build_http())
+            self._local.http = http
+        return http
+
     def _build_service(self):
+        from google.auth.transport.requests import Request as GoogleAuthRequest
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+
         creds = None
         if self.s.yt_token_file.exists():
             log(f"Loading existing YouTube token: {self.s.yt_token_file}")
@@ -287,9 +426,29 @@ class YouTubeUploader:
                     str(self.s.yt_client_secret_file), YOUTUBE_SCOPES
                 )
                 creds = flow.run_local_server(port=0)
-            self.s.yt_token_file.write_text(creds.to_json(), encoding="utf-8")
-            log(f"YouTube token saved to: {self.s.yt_token_file}")
-        return build("youtube", "v3", credentials=creds)
+            self._save_token(creds)
+        self.creds = creds
+        # The discovery document ships with googleapiclient, so no HTTP round trip
+        # (and nothing worth caching) when the service is built.
+        return build(
+            "youtube", "v3", credentials=creds, static_discovery=True, cache_discovery=False
+        )
+
+    def _save_token(self, creds: Any) -> None:
+        self.s.yt_token_file.write_text(creds.to_json(), encoding="utf-8")
+        log(f"YouTube token saved to: {self.s.yt_token_file}")
+
+    def _ensure_fresh_token(self) -> None:
+        """Refresh ahead of expiry so a long-lived uploader never starts a batch on a dying token."""
+        from google.auth.transport.requests import Request as GoogleAuthRequest
+
+        expiry = self.creds.expiry  # naive UTC, per google-auth
+        if expiry is None or not self.creds.refresh_token:
+            return
+        if expiry - datetime.utcnow() < YT_TOKEN_REFRESH_MARGIN:
+            log("Refreshing YouTube token before upload")
+            self.creds.refresh(GoogleAuthRequest())
+            self._save_token(self.creds)
 
     def upload(
         self,
@@ -298,6 +457,8 @@ class YouTubeUploader:
         description: str,
         tags: Optional[List[str]] = None,
     ) -> str:
+        from googleapiclient.http import MediaFileUpload
+
         log(f"Uploading clip to YouTube: {file_path.name}")
         body = {
             "snippet": {
@@ -311,51 +472,131 @@ class YouTubeUploader:
                 "selfDeclaredMadeForKids": False,
             },
         }
-        media = MediaFileUpload(str(file_path), chunksize=-1, resumable=True)
+        media = MediaFileUpload(str(file_path), chunksize=YT_UPLOAD_CHUNK_SIZE, resumable=True)
         req = self.service.videos().insert(
             part="snippet,status", body=body, media_body=media
         )
+        http = self._thread_http()
         response = None
         while response is None:
-            _, response = req.next_chunk()
+            _, response = req.next_chunk(http=http)
         log(f"YouTube upload complete: video_id={response['id']}")
         return response["id"]
 
+    def upload_all(self, jobs: List[Tuple[Path, str, str]]) -> List[str]:
+        """Upload (file_path, title, description) jobs concurrently; ids keep job order."""
+        if not jobs:
+            return []
+        self._ensure_fresh_token()
+        video_ids: List[str] = [""] * len(jobs)
+        with ThreadPoolExecutor(max_workers=min(YT_UPLOAD_WORKERS, len(jobs))) as pool:
+            futures = {
+                pool.submit(self.upload, file_path, title, description): i
+                for i, (file_path, title, description) in enumerate(jobs)
+            }
+            for future in as_completed(futures):
+                video_ids[futures[future]] = future.result()
+        return video_ids
+
 
 def load_processed(path: Path) -> Dict[str, Any]:
     if not path.exists():
         return {"processed_files": []}
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return orjson.loads(path.read_bytes())
     except Exception:
         return {"processed_files": []}
 
 
+def _vod_key(path: Any) -> str:
+    """Normalized absolute path used as the processed-state key (no filesystem access)."""
+    return os.path.normpath(os.path.abspath(str(path)))
+
+
+def processed_index(processed: Dict[str, Any]) -> Set[str]:
+    return {_vod_key(p) for p in processed.get("processed_files", [])}
+
+
+_processed_dirty = False
+_processed_saved_at = 0.0
+
+
 def save_processed(path: Path, state: Dict[str, Any]) -> None:
+    """Write state atomically: temp file + fsync + os.replace, so a crash never truncates it."""
+    global _processed_dirty, _processed_saved_at
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    data = orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    with tmp.open("wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _processed_dirty = False
+    _processed_saved_at = time.monotonic()
+
+
+def save_processed_debounced(path: Path, state: Dict[str, Any]) -> None:
+    """Save at most once per PROCESSED_SAVE_INTERVAL_SEC; later changes wait for flush."""
+    global _processed_dirty
+    _processed_dirty = True
+    if time.monotonic() - _processed_saved_at >= PROCESSED_SAVE_INTERVAL_SEC:
+        save_processed(path, state)
+
+
+def flush_processed(path: Path, state: Dict[str, Any]) -> None:
+    if _processed_dirty:
+        save_processed(path, state)
+
+
+VodEntry = Tuple[str, int, float]  # (path, st_size, st_mtime)
+
+
+def _iter_vods(
+    root: Path, exts: Tuple[str, ...], name_contains: str = "", recursive: bool = True
+) -> Iterator[VodEntry]:
+    """Yield (path, size, mtime) for media files under root, filtering by name before stat."""
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                    continue
+                if not entry.name.lower().endswith(exts):
+                    continue
+                if name_contains and name_contains not in entry.name:
+                    continue
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            yield entry.path, st.st_size, st.st_mtime
 
 
-def list_vod_candidates(settings: Settings) -> List[Path]:
+def list_vod_candidates(settings: Settings) -> List[VodEntry]:
     if not settings.watch_dir.exists():
         return []
-    files: List[Path] = []
-    for p in settings.watch_dir.rglob("*"):
-        if p.is_file() and p.suffix.lower() in settings.vod_extensions:
-            files.append(p)
-    return sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)
+    return list(_iter_vods(settings.watch_dir, settings.vod_extensions))
 
 
-def is_file_stable(path: Path, stable_for_sec: int) -> bool:
-    size1 = path.stat().st_size
+def is_file_stable(path: Path, stable_for_sec: int, known_size: Optional[int] = None) -> bool:
+    size1 = path.stat().st_size if known_size is None else known_size
     time.sleep(max(1, stable_for_sec // 3))
     size2 = path.stat().st_size
     return size1 == size2
 
 
-def wait_for_finished_vod(settings: Settings, processed: Dict[str, Any]) -> Path:
+def wait_for_finished_vod(settings: Settings, seen: Set[str]) -> Path:
     min_bytes = settings.min_vod_size_mb * 1024 * 1024
-    seen = set(processed.get("processed_files", []))
     cycle = 0
 
     while True:
@@ -364,62 +605,240 @@ def wait_for_finished_vod(settings: Settings, processed: Dict[str, Any]) -> Path
         log(
             f"Poll cycle #{cycle}: found {len(candidates)} candidate file(s) in {settings.watch_dir}"
         )
-        for p in candidates:
-            key = str(p.resolve())
-            if key in seen:
-                continue
-            if p.stat().st_size < min_bytes:
-                continue
-            age = time.time() - p.stat().st_mtime
-            if age < settings.stable_for_sec:
-                continue
-            if is_file_stable(p, settings.stable_for_sec):
+        now = time.time()
+        ready = [
+            (path, size, mtime)
+            for path, size, mtime in candidates
+            if size >= min_bytes
+            and now - mtime >= settings.stable_for_sec
+            and _vod_key(path) not in seen
+        ]
+        # Newest first; only the few ready files are sorted, not the whole tree.
+        ready.sort(key=lambda t: t[2], reverse=True)
+        for path, size, _ in ready:
+            p = Path(path)
+            if is_file_stable(p, settings.stable_for_sec, known_size=size):
                 log(f"Selected stable VOD for processing: {p}")
                 return p
         log(f"No ready VOD yet. Sleeping {settings.poll_interval_sec}s")
-        time.sleep(settings.poll_interval_sec)
+        if _SHUTDOWN.wait(settings.poll_interval_sec):
+            raise InterruptedError("Shutdown requested while waiting for a finished VOD")
+
+
+def _vod_event_payload(path: str) -> Dict[str, Any]:
+    """Synthetic livestreamdvr-style payload so watcher events reuse the webhook flow."""
+    return {"action": "end_download", "data": {"vod": {"path_downloaded_vod": path}}}
+
+
+def start_vod_watcher(settings: Settings, seen: Set[str]) -> Optional[Any]:
+    """Push finished VODs onto WebhookHandler.event_queue on inotify IN_CLOSE_WRITE.
+
+    Returns the running observer, or None when events are disabled, the platform is
+    not Linux or watchdog is not installed; the caller then falls back to polling.
+    """
+    if not settings.vod_watch_events or not sys.platform.startswith("linux"):
+        return None
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        log("watchdog is not installed; falling back to polling", level="WARNING")
+        return None
+    if not settings.watch_dir.exists():
+        return None
+
+    min_bytes = settings.min_vod_size_mb * 1024 * 1024
+
+    def offer(path: str, block: bool = False) -> None:
+        if not path.lower().endswith(settings.vod_extensions):
+            return
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return
+        if size < min_bytes or _vod_key(path) in seen:
+            return
+        log(f"VOD ready for processing: {path}")
+        if WebhookHandler.enqueue(_vod_event_payload(path), block=block) == "full":
+            log(f"Event queue is full, dropping watcher event: {path}", level="WARNING")
+
+    def sweep() -> None:
+        # Files closed before startup produce no close event. Offer settled ones newest
+        # first, blocking on the queue so a large backlog is not dropped, and re-sweep
+        # every poll interval for files that were still settling at startup.
+        offered: Set[str] = set()
+        while not _SHUTDOWN.is_set():
+            now = time.time()
+            settled = [
+                (path, mtime)
+                for path, _, mtime in _iter_vods(settings.watch_dir, settings.vod_extensions)
+                if now - mtime >= settings.stable_for_sec and path not in offered
+            ]
+            settled.sort(key=lambda t: t[1], reverse=True)
+            for path, _ in settled:
+                if _SHUTDOWN.is_set():
+                    return
+                offered.add(path)
+                offer(path, block=True)
+            _SHUTDOWN.wait(settings.poll_interval_sec)
+
+    class _ClosedVodHandler(FileSystemEventHandler):
+        def on_closed(self, event: Any) -> None:
+            if not event.is_directory:
+                offer(event.src_path)
+
+        def on_moved(self, event: Any) -> None:
+            if not event.is_directory:
+                offer(event.dest_path)
+
+    observer = Observer()
+    observer.schedule(_ClosedVodHandler(), str(settings.watch_dir), recursive=True)
+    observer.daemon = True
+    observer.start()
+    log(f"Watching {settings.watch_dir} for finished VODs (inotify)")
+
+    threading.Thread(target=sweep, daemon=True).start()
+    return observer
+
+
+def _publish_copy(src: Path, dst: Path, mode: str) -> str:
+    """Place src at dst as cheaply as mode allows: hardlink, then reflink clone, then copy."""
+    if mode == "link":
+        try:
+            os.link(src, dst)
+            return "link"
+        except OSError:
+            pass
+    if mode in {"link", "reflink"}:
+        try:
+            subprocess.run(
+                # "always" fails instead of silently copying, so "reflink" means a real clone.
+                ["cp", "--reflink=always", "--preserve=mode,timestamps", str(src), str(dst)],
+                check=True,
+                capture_output=True,
+            )
+            return "reflink"
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
 
 
 def publish_vod_local_http(settings: Settings, vod_path: Path) -> str:
     settings.public_output_dir.mkdir(parents=True, exist_ok=True)
     unique_name = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{_safe_name(vod_path.name)}"
     dst = settings.public_output_dir / unique_name
-    log(f"Publishing VOD via local_http: copy {vod_path} -> {dst}")
-    shutil.copy2(vod_path, dst)
+    log(f"Publishing VOD via local_http ({settings.publish_copy_mode}): {vod_path} -> {dst}")
+    used = _publish_copy(vod_path, dst, settings.publish_copy_mode)
+    if used != settings.publish_copy_mode:
+        log(f"PUBLISH_COPY_MODE={settings.publish_copy_mode} unavailable, used {used}")
     return f"{settings.public_base_url}/{unique_name}"
 
 
-def _upload_to_dropbox(dbx: Dropbox, local_path: Path, dropbox_path: str) -> None:
-    """Upload file to Dropbox, using chunked upload for files > 150MB."""
-    chunk_size = 4 * 1024 * 1024  # 4 MB
+def _hash_dropbox_blocks(data: bytes, block_hashes: List[bytes]) -> None:
+    view = memoryview(data)
+    for start in range(0, len(view), DROPBOX_HASH_BLOCK_SIZE):
+        block_hashes.append(hashlib.sha256(view[start:start + DROPBOX_HASH_BLOCK_SIZE]).digest())
+
+
+def _dropbox_content_hash(block_hashes: List[bytes]) -> str:
+    return hashlib.sha256(b"".join(block_hashes)).hexdigest()
+
+
+def _read_chunks(
+    f: Any,
+    total: int,
+    chunk_size: int,
+    out: "queue.Queue[Any]",
+    block_hashes: List[bytes],
+    stop: threading.Event,
+) -> None:
+    """Producer: read `total` bytes into `out` in chunks (b"" marks EOF), hashing as it goes."""
+    remaining = total
+    while not stop.is_set():
+        try:
+            data = f.read(min(chunk_size, remaining)) if remaining > 0 else b""
+            remaining -= len(data)
+            _hash_dropbox_blocks(data, block_hashes)
+            item: Any = data
+        except Exception as exc:  # handed over to the uploading thread
+            item = exc
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        if not isinstance(item, bytes) or not item:
+            return
+
+
+def _next_chunk(chunks: "queue.Queue[Any]") -> bytes:
+    item = chunks.get()
+    if isinstance(item, Exception):
+        raise item
+    return item
+
+
+def _upload_to_dropbox(dbx: "Dropbox", local_path: Path, dropbox_path: str) -> None:
+    """Upload file to Dropbox, using chunked upload for files >= 8MB."""
+    from dropbox.files import CommitInfo, UploadSessionCursor, WriteMode
+
     file_size = local_path.stat().st_size
+    block_hashes: List[bytes] = []
 
     with local_path.open("rb") as f:
-        if file_size <= 150 * 1024 * 1024:  # <= 150 MB
+        if file_size < DROPBOX_SINGLE_UPLOAD_LIMIT:
             log(f"Uploading to Dropbox in single request: {local_path} -> {dropbox_path}")
-            dbx.files_upload(f.read(), dropbox_path, mode=WriteMode.overwrite)
+            data = f.read()
+            _hash_dropbox_blocks(data, block_hashes)
+            metadata = dbx.files_upload(data, dropbox_path, mode=WriteMode.overwrite)
         else:
             log(
                 f"Uploading to Dropbox via chunked session: {local_path} -> {dropbox_path}, "
                 f"size={file_size} bytes"
             )
-            data = f.read(chunk_size)
-            result = dbx.files_upload_session_start(data)
-            cursor = UploadSessionCursor(session_id=result.session_id, offset=f.tell())
-            commit = CommitInfo(path=dropbox_path, mode=WriteMode.overwrite)
-
-            while f.tell() < file_size:
-                remaining = file_size - f.tell()
-                data = f.read(min(chunk_size, remaining))
-                if remaining <= chunk_size:
-                    dbx.files_upload_session_finish(data, cursor, commit)
-                else:
+            # Two slots: one chunk in flight over HTTPS while the next is read from disk.
+            chunks: "queue.Queue[Any]" = queue.Queue(maxsize=2)
+            stop = threading.Event()
+            reader = threading.Thread(
+                target=_read_chunks,
+                args=(f, file_size, DROPBOX_CHUNK_SIZE, chunks, block_hashes, stop),
+                daemon=True,
+            )
+            reader.start()
+            try:
+                data = _next_chunk(chunks)
+                result = dbx.files_upload_session_start(data)
+                offset = len(data)
+                cursor = UploadSessionCursor(session_id=result.session_id, offset=offset)
+                commit = CommitInfo(path=dropbox_path, mode=WriteMode.overwrite)
+
+                while True:
+                    data = _next_chunk(chunks)
+                    if not data or offset + len(data) >= file_size:
+                        metadata = dbx.files_upload_session_finish(data, cursor, commit)
+                        break
                     dbx.files_upload_session_append_v2(data, cursor)
-                    cursor = UploadSessionCursor(session_id=cursor.session_id, offset=f.tell())
+                    offset += len(data)
+                    cursor = UploadSessionCursor(session_id=cursor.session_id, offset=offset)
+            finally:
+                stop.set()
+                reader.join()
+
+    expected = _dropbox_content_hash(block_hashes)
+    if metadata.content_hash and metadata.content_hash != expected:
+        raise RuntimeError(
+            f"Dropbox content_hash mismatch for {dropbox_path}: "
+            f"expected {expected}, got {metadata.content_hash}"
+        )
 
 
 def publish_vod_dropbox(settings: Settings, vod_path: Path) -> str:
-    dbx = Dropbox(settings.dropbox_access_token)
+    from dropbox import Dropbox
+    from dropbox.exceptions import ApiError
+
+    dbx = Dropbox(settings.dropbox_access_token, session=_HTTP)
     unique_name = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}_{_safe_name(vod_path.name)}"
     dropbox_path = f"{settings.dropbox_folder}/{unique_name}"
 
@@ -457,25 +876,38 @@ def publish_vod(settings: Settings, vod_path: Path) -> str:
     )
 
 
+def _download_one(
+    session: requests.Session, clip: Dict[str, Any], idx: int, output_dir: Path
+) -> Optional[Path]:
+    clip_id = clip.get("id", f"clip_{idx}")
+    url = clip.get("uriForPreview")
+    if not url:
+        log(f"Clip {clip_id} has no uriForPreview, skipping", level="WARNING")
+        return None
+    target = output_dir / f"{_safe_name(str(clip_id))}.mp4"
+    log(f"Downloading clip #{idx}: {url} -> {target}")
+    with session.get(url, stream=True, timeout=90) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        with target.open("wb") as f:
+            shutil.copyfileobj(r.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+    return target
+
+
 def download_clips(clips: List[Dict[str, Any]], output_dir: Path) -> List[Path]:
     output_dir.mkdir(parents=True, exist_ok=True)
-    downloaded: List[Path] = []
-    for idx, clip in enumerate(clips, start=1):
-        clip_id = clip.get("id", f"clip_{idx}")
-        url = clip.get("uriForPreview")
-        if not url:
-            log(f"Clip {clip_id} has no uriForPreview, skipping", level="WARNING")
-            continue
-        target = output_dir / f"{_safe_name(str(clip_id))}.mp4"
-        log(f"Downloading clip #{idx}: {url} -> {target}")
-        with requests.get(url, stream=True, timeout=90) as r:
-            r.raise_for_status()
-            with target.open("wb") as f:
-                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                    if chunk:
-                        f.write(chunk)
-        downloaded.append(target)
-    return downloaded
+    if not clips:
+        return []
+    results: List[Optional[Path]] = [None] * len(clips)
+    workers = min(CLIP_DOWNLOAD_WORKERS, len(clips))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_download_one, _HTTP, clip, idx, output_dir): idx
+            for idx, clip in enumerate(clips, start=1)
+        }
+        for future in as_completed(futures):
+            results[futures[future] - 1] = future.result()
+    return [p for p in results if p is not None]
 
 
 def build_yt_text(clip: Dict[str, Any], settings: Settings, default_idx: int) -> Tuple[str, str]:
@@ -497,6 +929,8 @@ def validate_settings(settings: Settings) -> None:
         raise ValueError("OPUS_BEARER_TOKEN is required")
     if settings.publish_mode == "local_http" and not settings.public_base_url:
         raise ValueError("PUBLIC_BASE_URL is required for local_http publish mode")
+    if settings.publish_copy_mode not in {"link", "reflink", "copy"}:
+        raise ValueError("PUBLISH_COPY_MODE must be 'link', 'reflink' or 'copy'")
     if settings.publish_mode == "dropbox":
         if not settings.dropbox_access_token:
             raise ValueError("DROPBOX_ACCESS_TOKEN is required for dropbox publish mode")
@@ -521,18 +955,24 @@ def log_startup_summary(settings: Settings, processed: Dict[str, Any]) -> None:
     log(f"YouTube token file: {settings.yt_token_file}")
 
 
-def run_pipeline_for_vod(settings: Settings, processed: Dict[str, Any], vod_path: Path) -> None:
+def run_pipeline_for_vod(
+    settings: Settings,
+    processed: Dict[str, Any],
+    seen: Set[str],
+    uploader: YouTubeUploader,
+    vod_path: Path,
+) -> None:
     log(f"Pipeline started for VOD: {vod_path}")
     if not vod_path.exists():
         raise FileNotFoundError(f"VOD file not found: {vod_path}")
-    seen = set(processed.get("processed_files", []))
-    if str(vod_path.resolve()) in seen:
+    key = _vod_key(vod_path)
+    if key in seen:
         log(f"Skip already processed VOD: {vod_path}", level="WARNING")
         return
     video_url = publish_vod(settings, vod_path)
     log(f"Published VOD URL: {video_url}")
 
-    opus = OpusClient(settings)
+    opus = OpusClient(settings, session=_HTTP, poll_session=_HTTP_POLL)
     project_id = opus.create_clip_project(video_url)
     log(f"Created Opus project: {project_id}")
 
@@ -543,18 +983,18 @@ def run_pipeline_for_vod(settings: Settings, processed: Dict[str, Any], vod_path
     downloaded_files = download_clips(clips, clips_dir)
     log(f"Downloaded clips: {len(downloaded_files)} -> {clips_dir}")
 
-    log("Starting YouTube uploader initialization")
-    uploader = YouTubeUploader(settings)
-    log("YouTube uploader initialized")
+    jobs: List[Tuple[Path, str, str]] = []
     for idx, file_path in enumerate(downloaded_files, start=1):
         clip_info = clips[idx - 1] if idx - 1 < len(clips) else {}
         title, description = build_yt_text(clip_info, settings, idx)
-        video_id = uploader.upload(file_path, title, description)
+        jobs.append((file_path, title, description))
+    for (file_path, _, _), video_id in zip(jobs, uploader.upload_all(jobs)):
         log(f"Uploaded to YouTube: {video_id} ({file_path.name})")
 
     processed.setdefault("processed_files", [])
-    processed["processed_files"].append(str(vod_path.resolve()))
-    save_processed(settings.processed_state_file, processed)
+    processed["processed_files"].append(key)
+    seen.add(key)
+    save_processed_debounced(settings.processed_state_file, processed)
     log("Pipeline completed successfully.")
 
 
@@ -569,16 +1009,13 @@ def _rewrite_source_path(settings: Settings, raw_path: str) -> Path:
 def _largest_media_in_dir(directory: Path, extensions: Tuple[str, ...]) -> Optional[Path]:
     if not directory.exists():
         return None
-    candidates = [
-        p for p in directory.iterdir()
-        if p.is_file() and p.suffix.lower() in extensions
-    ]
+    candidates = list(_iter_vods(directory, extensions, recursive=False))
     if not candidates:
         return None
-    return sorted(candidates, key=lambda p: p.stat().st_size, reverse=True)[0]
+    return Path(max(candidates, key=lambda t: t[1])[0])
 
 
-def resolve_vod_from_webhook(settings: Settings, payload: Dict[str, Any], processed: Dict[str, Any]) -> Optional[Path]:
+def resolve_vod_from_webhook(settings: Settings, payload: Dict[str, Any], seen: Set[str]) -> Optional[Path]:
     if payload.get("action") != "end_download":
         action = payload.get("action")
         log(f"Webhook action is not end_download: {action}", level="INFO")
@@ -607,15 +1044,11 @@ def resolve_vod_from_webhook(settings: Settings, payload: Dict[str, Any], proces
 
     basename = str(vod.get("basename", "")).strip()
     if basename and settings.watch_dir.exists():
-        all_files = list(settings.watch_dir.rglob("*"))
-        matching = [
-            p for p in all_files
-            if p.is_file() and p.suffix.lower() in settings.vod_extensions and basename in p.name
-        ]
+        matching = list(_iter_vods(settings.watch_dir, settings.vod_extensions, basename))
         if matching:
-            unseen = [p for p in matching if str(p.resolve()) not in set(processed.get("processed_files", []))]
+            unseen = [t for t in matching if _vod_key(t[0]) not in seen]
             use = unseen if unseen else matching
-            chosen = sorted(use, key=lambda p: p.stat().st_mtime, reverse=True)[0]
+            chosen = Path(max(use, key=lambda t: t[2])[0])
             log(f"Resolved VOD by basename fallback: {chosen}")
             return chosen
 
@@ -623,52 +1056,127 @@ def resolve_vod_from_webhook(settings: Settings, payload: Dict[str, Any], proces
     return None
 
 
+# Webhook replies are a fixed set, so they are encoded once at import.
+_RESP_OK = orjson.dumps({"status": "ok"})
+_RESP_NOT_FOUND = orjson.dumps({"status": "error", "message": "Not found"})
+_RESP_UNAUTHORIZED = orjson.dumps({"status": "error", "message": "Unauthorized"})
+_RESP_INVALID_JSON = orjson.dumps({"status": "error", "message": "Invalid JSON"})
+_RESP_DUPLICATE = orjson.dumps({"status": "error", "message": "Duplicate event"})
+_RESP_QUEUE_FULL = orjson.dumps({"status": "error", "message": "Queue full"})
+
+
+def _event_key(payload: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+    vod = data.get("vod") if isinstance(data.get("vod"), dict) else {}
+    for field in ("basename", "path_downloaded_vod", "path_playlist"):
+        value = vod.get(field)
+        if isinstance(value, str) and value.strip():
+            return str(payload.get("action")), value.strip()
+    return None
+
+
 class WebhookHandler(BaseHTTPRequestHandler):
-    event_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    # Keep-alive: one handler thread serves many requests on a persistent connection
+    # instead of a new thread + TCP handshake per webhook.
+    protocol_version = "HTTP/1.1"
+    timeout = 30  # drop idle keep-alive connections
+    event_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=EVENT_QUEUE_MAXSIZE)
     settings: Optional[Settings] = None
-
-    def _json_response(self, status: int, payload: Dict[str, Any]) -> None:
-        body = json.dumps(payload).encode("utf-8")
+    # (action, vod identity) -> monotonic time it was queued; oldest first.
+    _recent_events: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+    _recent_lock = threading.Lock()
+
+    @classmethod
+    def enqueue(cls, payload: Dict[str, Any], block: bool = False) -> str:
+        """Queue an event unless it repeats a recent one. Returns queued | duplicate | full.
+
+        With block=True the put waits for space (outside the dedup lock) instead of
+        reporting "full".
+        """
+        key = _event_key(payload)
+        now = time.monotonic()
+        with cls._recent_lock:
+            if key is not None:
+                queued_at = cls._recent_events.get(key)
+                if queued_at is not None and now - queued_at < EVENT_DEDUP_WINDOW_SEC:
+                    return "duplicate"
+            if not block:
+                try:
+                    cls.event_queue.put_nowait(payload)
+                except queue.Full:
+                    return "full"
+            if key is not None:
+                cls._recent_events[key] = now
+                cls._recent_events.move_to_end(key)
+                while len(cls._recent_events) > EVENT_DEDUP_MAX_KEYS:
+                    cls._recent_events.popitem(last=False)
+        if block:
+            cls.event_queue.put(payload)
+        return "queued"
+
+    def _json_response(self, status: int, body: bytes) -> None:
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
         self.wfile.write(body)
 
     def do_POST(self) -> None:  # noqa: N802
         if not WebhookHandler.settings:
-            self._json_response(500, {"status": "error", "message": "Settings not loaded"})
+            self.close_connection = True
+            self._json_response(
+                500, orjson.dumps({"status": "error", "message": "Settings not loaded"})
+            )
             return
         s = WebhookHandler.settings
 
         if self.path != s.webhook_path:
             log(f"Received POST on unexpected path: {self.path}", level="WARNING")
-            self._json_response(404, {"status": "error", "message": "Not found"})
+            self.close_connection = True  # request body was not read
+            self._json_response(404, _RESP_NOT_FOUND)
             return
 
         if s.webhook_token:
             got = self.headers.get("X-Webhook-Token", "")
             if got != s.webhook_token:
                 log("Webhook token mismatch", level="WARNING")
-                self._json_response(401, {"status": "error", "message": "Unauthorized"})
+                self.close_connection = True  # request body was not read
+                self._json_response(401, _RESP_UNAUTHORIZED)
                 return
 
         try:
-            content_length = int(self.headers.get("Content-Length", "0"))
-        except ValueError:
+            content_length = int(self.headers["Content-Length"])
+        except (KeyError, TypeError, ValueError):
+            content_length = -1
+        if content_length < 0 or "Transfer-Encoding" in self.headers:
+            # Body length unknown (e.g. chunked): whatever is left unread must not be
+            # parsed as the next keep-alive request.
+            self.close_connection = True
             content_length = 0
         raw = self.rfile.read(content_length) if content_length > 0 else b"{}"
         try:
-            payload = json.loads(raw.decode("utf-8"))
+            payload = orjson.loads(raw)
+            if not isinstance(payload, dict):
+                raise ValueError("payload is not an object")
         except Exception:
             log("Webhook payload JSON decode failed", level="WARNING")
-            self._json_response(400, {"status": "error", "message": "Invalid JSON"})
+            self._json_response(400, _RESP_INVALID_JSON)
             return
 
         action = payload.get("action")
+        result = WebhookHandler.enqueue(payload)
+        if result == "duplicate":
+            log(f"Duplicate webhook event ignored. action={action}", level="WARNING")
+            self._json_response(429, _RESP_DUPLICATE)
+            return
+        if result == "full":
+            log(f"Event queue is full, rejecting webhook. action={action}", level="WARNING")
+            self._json_response(503, _RESP_QUEUE_FULL)
+            return
         log(f"Webhook event accepted. action={action}")
-        WebhookHandler.event_queue.put(payload)
-        self._json_response(200, {"status": "ok"})
+        self._json_response(200, _RESP_OK)
 
     def log_message(self, fmt: str, *args: Any) -> None:
         print(f"[webhook] {fmt % args}")
@@ -677,6 +1185,7 @@ class WebhookHandler(BaseHTTPRequestHandler):
 def start_webhook_server(settings: Settings) -> ThreadingHTTPServer:
     WebhookHandler.settings = settings
     httpd = ThreadingHTTPServer((settings.webhook_host, settings.webhook_port), WebhookHandler)
+    httpd.daemon_threads = True
     thread = threading.Thread(target=httpd.serve_forever, daemon=True)
     thread.start()
     log(
@@ -685,59 +1194,142 @@ def start_webhook_server(settings: Settings) -> ThreadingHTTPServer:
     return httpd
 
 
+class _IdleLogger:
+    """Logs "still waiting" from its own thread while the consumer is blocked on the queue."""
+
+    def __init__(self, interval_sec: int):
+        self._interval = interval_sec
+        self._cond = threading.Condition()
+        self._idle_since: Optional[float] = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def idle(self) -> None:
+        with self._cond:
+            self._idle_since = time.monotonic()
+            self._cond.notify()
+
+    def busy(self) -> None:
+        with self._cond:
+            self._idle_since = None
+            self._cond.notify()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not _SHUTDOWN.is_set():
+                if self._idle_since is None:
+                    self._cond.wait()
+                    continue
+                due = self._idle_since + self._interval - time.monotonic()
+                if due > 0:
+                    self._cond.wait(due)
+                    continue
+                log(
+                    "Still waiting for webhook event (action=end_download). "
+                    f"No events received in last {self._interval}s."
+                )
+                self._idle_since = time.monotonic()
+
+
+def _announce_shutdown(signum: int) -> None:
+    log(f"Received signal {signum}, shutting down")
+    WebhookHandler.event_queue.put(_STOP_EVENT)
+
+
+def request_shutdown(signum: int, _frame: Any) -> None:
+    _SHUTDOWN.set()
+    # Neither the queue lock nor buffered stdout is reentrant, so logging and the
+    # put happen on a helper thread; a second signal falls through to the default.
+    threading.Thread(target=_announce_shutdown, args=(signum,), daemon=True).start()
+    signal.signal(signum, signal.default_int_handler if signum == signal.SIGINT else signal.SIG_DFL)
+
+
+def consume_events(
+    settings: Settings, processed: Dict[str, Any], seen: Set[str], uploader: YouTubeUploader
+) -> None:
+    """Run pipelines for events on WebhookHandler.event_queue (webhooks or file watcher)."""
+    handled = 0
+    idle_logger = _IdleLogger(EVENT_IDLE_LOG_SEC)
+    while not _SHUTDOWN.is_set():
+        idle_logger.idle()
+        payload = WebhookHandler.event_queue.get()
+        idle_logger.busy()
+        if payload is _STOP_EVENT:
+            break
+        vod_path = resolve_vod_from_webhook(settings, payload, seen)
+        if not vod_path:
+            action = payload.get("action")
+            if action:
+                log(f"Ignored webhook action: {action}")
+            continue
+        try:
+            run_pipeline_for_vod(settings, processed, seen, uploader, vod_path)
+            handled += 1
+        except Exception as exc:
+            if _SHUTDOWN.is_set():
+                break
+            log_exception("Pipeline error", exc)
+        if settings.run_once and handled >= 1:
+            log("RUN_ONCE=true and one job handled. Exiting.")
+            break
+    if _SHUTDOWN.is_set():
+        log("Shutdown requested. Stopped consuming events.")
+
+
 def main() -> None:
     settings = Settings.from_env()
     validate_settings(settings)
     processed = load_processed(settings.processed_state_file)
+    seen = processed_index(processed)
+    atexit.register(flush_processed, settings.processed_state_file, processed)
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
     log_startup_summary(settings, processed)
 
+    # Built once per process: token load/refresh and service construction are
+    # shared by every VOD handled in long-running mode.
+    log("Starting YouTube uploader initialization")
+    uploader = YouTubeUploader(settings)
+    log("YouTube uploader initialized")
+
     if settings.explicit_vod_file:
         log(f"Explicit VOD_FILE mode enabled: {settings.explicit_vod_file}")
-        run_pipeline_for_vod(settings, processed, settings.explicit_vod_file)
+        run_pipeline_for_vod(settings, processed, seen, uploader, settings.explicit_vod_file)
         return
 
     if settings.trigger_mode == "webhook":
         server = start_webhook_server(settings)
-        handled = 0
         try:
-            while True:
-                try:
-                    payload = WebhookHandler.event_queue.get(timeout=60)
-                except queue.Empty:
-                    log(
-                        "Still waiting for webhook event (action=end_download). "
-                        "No events received in last 60s."
-                    )
-                    continue
-                vod_path = resolve_vod_from_webhook(settings, payload, processed)
-                if not vod_path:
-                    action = payload.get("action")
-                    if action:
-                        log(f"Ignored webhook action: {action}")
-                    continue
-                try:
-                    run_pipeline_for_vod(settings, processed, vod_path)
-                    handled += 1
-                except Exception as exc:
-                    log_exception("Pipeline error", exc)
-                if settings.run_once and handled >= 1:
-                    log("RUN_ONCE=true and one job handled. Exiting.")
-                    break
+            consume_events(settings, processed, seen, uploader)
         finally:
             log("Shutting down webhook server")
             server.shutdown()
-    else:
-        while True:
-            try:
-                log("Waiting for finished VOD in poll mode")
-                vod_path = wait_for_finished_vod(settings, processed)
-                run_pipeline_for_vod(settings, processed, vod_path)
-            except Exception as exc:
-                log_exception("Pipeline error", exc)
-            if settings.run_once:
-                log("RUN_ONCE=true and poll cycle completed. Exiting.")
+        return
+
+    observer = start_vod_watcher(settings, seen)
+    if observer is not None:
+        try:
+            consume_events(settings, processed, seen, uploader)
+        finally:
+            observer.stop()
+            observer.join()
+        return
+
+    while True:
+        try:
+            log("Waiting for finished VOD in poll mode")
+            vod_path = wait_for_finished_vod(settings, seen)
+            run_pipeline_for_vod(settings, processed, seen, uploader, vod_path)
+        except Exception as exc:
+            if _SHUTDOWN.is_set():
+                log("Shutdown requested. Exiting poll loop.")
                 break
-            time.sleep(max(10, settings.poll_interval_sec))
+            log_exception("Pipeline error", exc)
+        if settings.run_once:
+            log("RUN_ONCE=true and poll cycle completed. Exiting.")
+            break
+        if _SHUTDOWN.wait(max(10, settings.poll_interval_sec)):
+            log("Shutdown requested. Exiting poll loop.")
+            break
 
 
 if __name__ == "__main__":